@@ -1,30 +1,137 @@
 # Standard library imports
+import collections
+import concurrent.futures
 import datetime as dt
+import functools
+import io
+import os
 import random
+import sys
 import textwrap as tw
+import threading
 import time
 import yaml
 from types import SimpleNamespace
 
+# Prefer the LibYAML-backed loader when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as Loader
+except ImportError:
+    from yaml import SafeLoader as Loader
+
 # Retrofeed imports
 from modules import ap_news, finance, weather, spot_the_station
 from modules import string_processing as sp
 
+@functools.lru_cache(maxsize=1)
+def load_config() -> dict:
+    '''Parse config.yaml once and share the result with every caller'''
+    with open('config.yaml', 'r') as f:
+        return yaml.load(f, Loader=Loader)
+
+# Most recent data fetched by any feed, keyed by (source module, args...)
+# so feeds sharing an upstream source don't each hit the network
+_DATA_CACHE = {}
+
+# Upper bound on fetches from any one source module in a five minute window,
+# regardless of how short the configured refresh intervals are
+MAX_FETCHES_PER_5MIN = 10
+
+# Per-source ring of (minute, fetch count) buckets covering the last five minutes
+_BUCKETS = {}
+_BUCKETS_LOCK = threading.Lock()
+
+def _rate_limited(source: str, force: bool = False):
+    '''Record a fetch from source and return None, unless that would
+    exceed MAX_FETCHES_PER_5MIN, in which case return the datetime at
+    which the oldest bucket leaves the window and a fetch is allowed again
+    A forced fetch is always recorded, even when over the limit'''
+    minute = int(time.time() // 60)
+    with _BUCKETS_LOCK:
+        buckets = _BUCKETS.setdefault(source, collections.deque())
+        while buckets and buckets[0][0] <= minute - 5:
+            buckets.popleft()
+        if sum(count for _, count in buckets) >= MAX_FETCHES_PER_5MIN and not force:
+            return dt.datetime.fromtimestamp((buckets[0][0] + 5) * 60)
+        if buckets and buckets[-1][0] == minute:
+            buckets[-1] = (minute, buckets[-1][1] + 1)
+        else:
+            buckets.append((minute, 1))
+        return None
+
+# Shared worker threads for network fetches, so the display never stalls on I/O
+_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+
+def stop_fetching():
+    '''Cancel any queued background fetches
+    Interpreter exit still joins workers that are mid-fetch, which is why
+    every source module passes a timeout to requests.get'''
+    _POOL.shutdown(wait=False, cancel_futures=True)
+
+# Ordinal suffix for each day of the month, indexed by day number
+_ORDINAL = tuple('th' if 11 <= d <= 13 else {1: 'st', 2: 'nd', 3: 'rd'}.get(d % 10, 'th')
+                 for d in range(32))
+
+# Final stretch of each pacing wait (in ns) that is spun rather than slept,
+# since sleep() can overshoot tiny delays by more than the delay itself
+SPIN_NS = 200_000
+
+def _wait_until(deadline):
+    '''Block until time.monotonic_ns() reaches deadline'''
+    now = time.monotonic_ns
+    remaining = deadline - now()
+    if remaining > SPIN_NS:
+        time.sleep((remaining - SPIN_NS) / 1e9)
+    while now() < deadline:
+        pass
+
+def _stdout_writer():
+    '''Return a function that writes a string to stdout immediately
+    Writes go straight to the file descriptor when stdout has one, and
+    through sys.stdout with a flush when it doesn't (e.g. captured output)'''
+    # Anything still sitting in sys.stdout's buffer has to go out first
+    sys.stdout.flush()
+    try:
+        fd = sys.stdout.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        stream = sys.stdout
+        def write(text):
+            stream.write(text)
+            stream.flush()
+        return write
+
+    encoding = sys.stdout.encoding or 'utf-8'
+    def write(text):
+        # os.write may accept only part of the buffer, so keep going
+        data = memoryview(text.encode(encoding, 'replace'))
+        while data:
+            data = data[os.write(fd, data):]
+    return write
+
 class BaseFeed(object):
     '''Base class for all feeds, handles config and slow printing'''
     def __init__(self):
         self.update_message = None
         self.data = {}
-        self.content = None
+        self._inflight = None
+        self._retry_at = None
+        # Reused across frames; _set_content clears and refills it
+        self.content = []
+        # Wrapped form of long content lines, valid for the data in _wrap_cache_data
+        self._wrap_cache = {}
+        self._wrap_cache_data = None
+        # Per-feed generator for burn-in jitter; avoids the shared global one
+        self._rng = random.Random()
+        self._rand_range = self._rng.randrange
         self._set_config()
         self.config.header = None
         self.config.update_message = None
+        self._rendered_header = None
+        self._refresh_interval = None
     
     def _set_config(self):
         '''Load the config from the config file'''
-        with open('config.yaml', 'r') as f:
-            cfg = yaml.load(f, Loader=yaml.FullLoader)
-        self.config = SimpleNamespace(**cfg['base'])
+        self.config = SimpleNamespace(**load_config()['base'])
 
     def get_config(self) -> dict:
         '''Return the config as a dict'''
@@ -37,44 +144,72 @@ class BaseFeed(object):
         cfg = self.get_config()
         cfg.update(dict)
         self.config = SimpleNamespace(**cfg)
+        # The header never changes between frames, so render it once here
+        if self.config.header:
+            self._rendered_header = self._get_header(self.config.header)
+        else:
+            self._rendered_header = None
+        if getattr(self.config, 'refresh', None) is not None:
+            self._refresh_interval = dt.timedelta(minutes=self.config.refresh)
 
-    def _slowp(self, s='', end='\n',):
+    def _slowp(self, s='', end='\n', _wrapped=False):
         '''Slow Print
         Similar to print() but with fun options
-        Wraps words at wrap_width characters if it is non-zero'''
-        if len(s) > self.config.line_width:
+        Wraps words at line_width characters unless _wrapped says the
+        caller already did'''
+        if not _wrapped and len(s) > self.config.line_width:
             lines = tw.wrap(s, self.config.line_width)
             # Call self for each line, but with wrapping off...
             for line in lines:
-                self._slowp(line, end=end)
+                self._slowp(line, end=end, _wrapped=True)
+            return
+        # Bind everything the per-character loop touches to locals
+        write = _stdout_writer()
+        wait = _wait_until
+        step = int(self.config.print_delay * 1e9)
+        # With no delay there is nothing to pace, so skip the loop entirely
+        if step <= 0:
+            write(s + end)
             return
-        for c in s:
-            print(c, end='', flush=True)
-            time.sleep(self.config.print_delay) 
-        print(end, end='', flush=True)
-        time.sleep(self.config.print_delay)
+        # Emit flush_every characters per write, pacing against a running
+        # deadline so sleep overshoot doesn't accumulate
+        chunk = max(1, getattr(self.config, 'flush_every', 1))
+        deadline = time.monotonic_ns()
+        for i in range(0, len(s), chunk):
+            part = s[i:i + chunk]
+            write(part)
+            deadline += step * len(part)
+            wait(deadline)
+        write(end)
+        wait(deadline + step)
 
     def _slown(self):
         '''Slow Newline
         Prints n spaces with a delay, then returns
         Picks a random position to pause to stave off
         screen burn-in (default = 0 = no pause)'''
-        pause_pos = random.randrange(self.config.line_width)
-        for i in range(self.config.line_width):
-            print(' ', end='', flush=True)
-            time.sleep(self.config.newline_delay)
-            if i == pause_pos:
-                time.sleep(self.config.pause_time)
-        print(flush=True)
-        time.sleep(self.config.print_delay)
+        write = _stdout_writer()
+        line_width = self.config.line_width
+        step = int(self.config.newline_delay * 1e9)
+        # Spaces are invisible, so emit each side of the pause as one write
+        # and spend the time the per-space loop would have taken
+        before = self._rand_range(line_width) + 1
+        deadline = time.monotonic_ns()
+        write(' ' * before)
+        deadline += step * before + int(self.config.pause_time * 1e9)
+        _wait_until(deadline)
+        write(' ' * (line_width - before) + '\n')
+        deadline += step * (line_width - before) + int(self.config.print_delay * 1e9)
+        _wait_until(deadline)
 
     def _print_update_msg(self):
         '''Display passed string as an "updating..." message'''
+        delay = self.config.subsegment_delay
         self._slowp(f'[{self.config.update_message}', end='')
         for i in range(3):
-            time.sleep(self.config.subsegment_delay)
+            time.sleep(delay)
             self._slowp('.', end='')
-        time.sleep(self.config.subsegment_delay)
+        time.sleep(delay)
         self._slowp(']')
         self._slown()
 
@@ -83,40 +218,101 @@ class BaseFeed(object):
         left_marker, string, right_marker = header
         string = string.strip().upper()
 
-        num_markers = 0
-        if len(string) + 4 < self.config.line_width:
-            num_markers = int((self.config.line_width - 4 - len(string)) / 2)
+        # Headers leave a column free at each edge, like the original layout,
+        # and always come out the same width whatever the title length
+        width = self.config.line_width - 2
 
-        header_string = f"{left_marker * num_markers} {string} {right_marker * num_markers}"
+        # Matching markers are just a centered fill
+        if left_marker == right_marker:
+            return f" {string} ".center(width, left_marker)
+
+        num_markers = max(0, width - 2 - len(string))
+        left = num_markers // 2
+        header_string = f"{left_marker * left} {string} {right_marker * (num_markers - left)}"
         return header_string
 
+    def _cached_fetch(self, key: tuple, fetch, *args) -> tuple:
+        '''Return (data, retry_at), where data is fetch(*args) or another
+        feed's result for the same key if it is newer than this feed's
+        refresh interval
+        The first element of key names the source for rate limiting; when a
+        source is over its limit, whatever was cached last is returned along
+        with the time a fetch is allowed again (otherwise retry_at is None).
+        With nothing cached yet the fetch goes ahead regardless'''
+        data = _DATA_CACHE.get(key)
+        if data is None or dt.datetime.now() - data['fetched_on'] >= self._refresh_interval:
+            retry_at = _rate_limited(key[0], force=data is None)
+            if retry_at is not None:
+                return data, retry_at
+            data = fetch(*args)
+            _DATA_CACHE[key] = data
+        return data, None
+
+    def _wrap_content(self):
+        '''Pre-wrap any content lines wider than line_width so show()
+        only ever hands _slowp lines that fit
+        Long lines (headlines, summaries, hazards) repeat from frame to
+        frame, so each is wrapped once and reused until the data changes'''
+        if self._wrap_cache_data is not self.data:
+            self._wrap_cache.clear()
+            self._wrap_cache_data = self.data
+        line_width = self.config.line_width
+        if all(len(line) <= line_width for line in self.content):
+            return
+        cache = self._wrap_cache
+        wrapped = []
+        for line in self.content:
+            if len(line) <= line_width:
+                wrapped.append(line)
+                continue
+            lines = cache.get(line)
+            if lines is None:
+                lines = cache[line] = tw.wrap(line, line_width)
+            wrapped.extend(lines)
+        self.content[:] = wrapped
+
     def _refresh_data(self):
-        #TODO: implement optional data cache across feed instances
-        data_age = dt.datetime.now() - self.data.get('fetched_on', dt.datetime.min)
-        if data_age >= dt.timedelta(minutes=self.config.refresh):
+        '''Pick up any finished background fetch and start a new one if
+        the data has gone stale'''
+        if self._inflight is not None and self._inflight.done():
+            self.data, self._retry_at = self._inflight.result()
+            self._inflight = None
+        now = dt.datetime.now()
+        fetched = self.data.get('fetched_on')
+        stale = fetched is None or now - fetched >= self._refresh_interval
+        # A fetch that was rate limited isn't retried until the limit lifts
+        throttled = self._retry_at is not None and now < self._retry_at
+        if stale and self._inflight is None and not throttled:
             if self.config.verbose_updates and self.config.update_message is not None:
                 self._print_update_msg()
-            self._set_data()
+            self._inflight = _POOL.submit(self._fetch_data)
+        # Nothing to show yet, so the first fetch has to be waited on
+        if self._inflight is not None and not self.data:
+            self.data, self._retry_at = self._inflight.result()
+            self._inflight = None
 
     def show(self):
         self._slown()
         self._slown()
         self._refresh_data()
         self._set_content()
-        if self.config.header is not None:
-            header = self._get_header(self.config.header)
-            self._slowp(header)
+        self._wrap_content()
+        if self._rendered_header:
+            self._slowp(self._rendered_header)
         self._slown()
         for line in self.content:
             if line == '':
                 self._slown()
             else:
-                self._slowp(line)
+                self._slowp(line, _wrapped=True)
         self._slown()
         time.sleep(self.config.segment_delay)
 
-    def _set_data(self):
-        '''Set the data for the feed
+    def _fetch_data(self) -> tuple:
+        '''Fetch fresh data for the feed, returning (data, retry_at) as
+        _cached_fetch does
+        Runs on a worker thread, so it must not modify the feed; _refresh_data
+        applies the result on the main thread
         This method should be overridden by child classes'''
         raise NotImplementedError
     
@@ -149,19 +345,11 @@ class DatetimeFeed(BaseFeed):
         pass
 
     def _set_content(self):
-        self.content = []
+        self.content.clear()
         now = dt.datetime.now()
         date_text = now.strftime(self.config.format)
         day_num = now.day
-        date_text += str(day_num)
-        if day_num in (1, 21, 31):
-            date_text += 'st'
-        elif day_num in (2, 22):
-            date_text += 'nd'
-        elif day_num in (3, 23):
-            date_text += 'rd'
-        else:
-            date_text += 'th'
+        date_text += str(day_num) + _ORDINAL[day_num]
         time_text = sp.format_time(now)
         if self.config.descriptive:
             self.content.append(f"It is {date_text}")
@@ -175,21 +363,22 @@ class FinanceFeed(BaseFeed):
         super().__init__()
         self._update_config(config)
 
-    def _set_data(self):
-        self.data = finance.get_finance(self.config.symbols)
+    def _fetch_data(self) -> tuple:
+        key = ('finance', tuple(self.config.symbols.items()))
+        return self._cached_fetch(key, finance.get_finance, self.config.symbols)
 
     def _set_content(self):
-        self.content = []       
+        self.content.clear()
          
         if 'CLOSED' in self.data['market_message'].upper():
             self.content.append(self.data['market_message'])
         else:
             self.content.append(f"As of {sp.format_time(self.data['fetched_on'])}")
         
-        for i in self.data['indexes']:
-            self.content.append('')
-            self.content.append(f"    {i['name']:9}  {i['price']:>9}")
-            self.content.append(f"               {i['delta']:>9}  {i['delta_pct']}")
+        self.content.extend([line for i in self.data['indexes']
+                             for line in ('',
+                                          f"    {i['name']:9}  {i['price']:>9}",
+                                          f"               {i['delta']:>9}  {i['delta_pct']}")])
 
 
 class NewsFeed(BaseFeed):
@@ -198,47 +387,45 @@ class NewsFeed(BaseFeed):
         self._update_config(config)
         self.current_index = 0
 
-    def _set_data(self):
-        self.data = ap_news.get_news()
+    def _fetch_data(self) -> tuple:
         #TODO: implement max news items
+        return self._cached_fetch(('ap_news',), ap_news.get_news)
 
     def _set_content(self):
-        self.content = []
+        self.content.clear()
 
         if not self.config.cycle:
             self.current_index = 0
-        items = min(self.config.items, len(self.data['items']))
-        for i in range(1, items+1):
-            self.current_index += i
-            if self.current_index >= len(self.data['items']):
-                self.current_index = 0
+        num_items = len(self.data['items'])
+        for _ in range(min(self.config.items, num_items)):
+            # Show the current item, then step to the next one, wrapping around
+            item = self.data['items'][self.current_index % num_items]
+            self.current_index = (self.current_index + 1) % num_items
             self.content.append('')
-            self.content.append(self.data['items'][self.current_index]['headline'])
+            self.content.append(item['headline'])
             if self.config.show_summary:
-                self.content.append('')
-                self.content.append(self.data['items'][self.current_index]['summary'])
-                self.content.append('')
+                self.content.extend(('', item['summary'], ''))
 
 
 class WeatherFeed(BaseFeed):
     def __init__(self, config: dict):
         super().__init__()
         self._update_config(config)
+        self._forecast_header = self._get_header(['*', 'Extended Forecast...', '*'])
 
-    def _set_data(self):
-        self.data = weather.get_weather(self.config.lat, self.config.lon, self.config.location)
+    def _fetch_data(self) -> tuple:
+        args = (self.config.lat, self.config.lon, self.config.location)
+        return self._cached_fetch(('weather',) + args, weather.get_weather, *args)
 
     def _set_content(self):
-        self.content = []
+        self.content.clear()
 
         self.content.append(f"Weather at {self.data['location']}")
         self.content.append(f"As of {self.data['last_update']}")
         
-        if len(self.data['hazards']) > 0:
-            for hazard in self.data['hazards']:
-                self.content.append('')
-                self.content.append(f"!!! {hazard}")
-                
+        self.content.extend([line for hazard in self.data['hazards']
+                             for line in ('', f"!!! {hazard}")])
+
         self.content.append('')
         self.content.append(f"    Conditions   {self.data['currently']}")
         self.content.append(f"    Temperature  {self.data['temp_f']} ({self.data['temp_c']})")
@@ -250,12 +437,9 @@ class WeatherFeed(BaseFeed):
         if forecast_periods > 0:
             self.content.append('')
             if forecast_periods > 1:
-                header = self._get_header(['*', 'Extended Forecast...', '*'])
-                self.content.append(header)
-            for period in self.data['periods'][:forecast_periods]:
-                self.content.append('')
-                self.content.append(period['timeframe'])
-                self.content.append(period['forecast'])
+                self.content.append(self._forecast_header)
+            self.content.extend([line for period in self.data['periods'][:forecast_periods]
+                                 for line in ('', period['timeframe'], period['forecast'])])
 
 
 class ISSFeed(BaseFeed):
@@ -263,14 +447,13 @@ class ISSFeed(BaseFeed):
         super().__init__()
         self._update_config(config)
 
-    def _set_data(self):
-        self.data = spot_the_station.get_sightings(self.config.country,
-                                                   self.config.region,
-                                                   self.config.city,
-                                                   )
+    def _fetch_data(self) -> tuple:
+        args = (self.config.country, self.config.region, self.config.city)
+        return self._cached_fetch(('spot_the_station',) + args,
+                                  spot_the_station.get_sightings, *args)
 
     def _set_content(self):
-        self.content = []
+        self.content.clear()
 
         # Exit early if nothing to show
         sightings = self.data['sightings']
@@ -279,14 +462,12 @@ class ISSFeed(BaseFeed):
         else:
             self.content.append(self.data['location'])
             self.content.append('Upcoming ISS Sightings:')
-            num_shown = 0
             cutoff_dt = dt.datetime.now()
-            for s in sightings:
-                if s['date_time'] >= cutoff_dt and num_shown < self.config.max_sightings:
-                    self.content.append('')
-                    self.content.append(f"    {s['date_text']} @ {s['time_text']}")
-                    self.content.append(f"      Visible for {s['visible']}")
-                    self.content.append(f"      Max height {s['max_height']} Degrees")
-                    self.content.append(f"      From {s['appears']}")
-                    self.content.append(f"      To   {s['disappears']}")
-                    num_shown += 1
+            upcoming = [s for s in sightings if s['date_time'] >= cutoff_dt]
+            self.content.extend([line for s in upcoming[:self.config.max_sightings]
+                                 for line in ('',
+                                              f"    {s['date_text']} @ {s['time_text']}",
+                                              f"      Visible for {s['visible']}",
+                                              f"      Max height {s['max_height']} Degrees",
+                                              f"      From {s['appears']}",
+                                              f"      To   {s['disappears']}")])
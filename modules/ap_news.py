@@ -34,8 +34,12 @@ def get_news():
            }
     url = 'https://apnews.com'
     
-    response = requests.get(url, headers={'Cache-Control': 'no-cache'})
-    if response.status_code == 200:
+    try:
+        response = requests.get(url, headers={'Cache-Control': 'no-cache'},
+                                timeout=15)
+    except requests.RequestException:
+        response = None
+    if response is not None and response.status_code == 200:
         split_source = response.text.split('"firstWords":')
         for chunk in split_source:
             headline = get_headline(chunk)
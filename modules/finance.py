@@ -61,7 +61,11 @@ def get_finance(symbols):
            }
     url = 'https://finance.yahoo.com'
     
-    response = requests.get(url, headers={'Cache-Control': 'no-cache'})
+    try:
+        response = requests.get(url, headers={'Cache-Control': 'no-cache'},
+                                timeout=15)
+    except requests.RequestException:
+        return fin
     if response.status_code != 200:
         return fin
         
@@ -71,8 +71,11 @@ def get_sightings(country, region, city, location=None):
            
     url = f'https://spotthestation.nasa.gov/sightings/view.cfm?country={country}&region={region}&city={city}'
     
-    response = requests.get(url)
-    if response.status_code == 200:
+    try:
+        response = requests.get(url, timeout=15)
+    except requests.RequestException:
+        response = None
+    if response is not None and response.status_code == 200:
         soup = BeautifulSoup(response.text, 'html.parser')
         iss['sightings'] = parse_sightings(soup)
         
@@ -48,7 +48,11 @@ def get_weather(lat, lon, location=None):
     #url = f'https://forecast.weather.gov/MapClick.php?textField1={lat}&textField2={lon}'
     url = f'https://forecast.weather.gov/MapClick.php?lat={lat}&lon={lon}'
     #print(url)
-    response = requests.get(url, headers={'Cache-Control':'no-cache', 'Pragma':'no-cache'})
+    try:
+        response = requests.get(url, headers={'Cache-Control':'no-cache', 'Pragma':'no-cache'},
+                                timeout=15)
+    except requests.RequestException:
+        return(assign_errors(wx))
     if response.status_code != 200:
         return(assign_errors(wx))     
     #print(response.headers)
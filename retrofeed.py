@@ -1,32 +1,32 @@
 import os
-import yaml
 
-# import all the feed classes, these will be available in the global namespace
+# import all the feed classes (plus load_config and stop_fetching),
+# these will be available in the global namespace
 from feeds import *
 
 def construct_sequence():
-    # Load the configuration file
-    with open('config.yaml', 'r') as f:
-        cfg = yaml.load(f, Loader=yaml.FullLoader)
+    # Load the configuration file (parsed once, shared with the feeds)
+    cfg = load_config()
 
     # Construct the sequence of feeds
     sequence = []
     instances = {}
+    # Feed classes are looked up by name in this module's namespace
+    module_globals = globals()
     for feed in cfg['sequence']:
-        if feed in instances.keys():
-            # If the feed has already been instantiated, add the existing instance to the sequence
-            sequence.append(instances[feed])
-        else:
+        # If the feed has already been instantiated, reuse the existing instance
+        feed_instance = instances.get(feed)
+        if feed_instance is None:
             # get the dictionary named by the sequence feed
             feed_config = cfg[feed]
             # find the Class object named by the feed_class key
-            feed_class = globals()[feed_config['feed_class']]
+            feed_class = module_globals[feed_config['feed_class']]
             # Create a new instance of the specified feed class
             feed_instance = feed_class(feed_config)
             # Add the instance to the dictionary of instances
             instances[feed] = feed_instance
-            # Add the instance to the sequence
-            sequence.append(feed_instance)
+        # Add the instance to the sequence
+        sequence.append(feed_instance)
 
     return sequence
 
@@ -39,9 +39,13 @@ def main():
     title.show()
 
     # Main loop
-    while True:
-        for feed in feed_sequence:
-            feed.show()
+    try:
+        while True:
+            for feed in feed_sequence:
+                feed.show()
+    finally:
+        # Don't let queued fetches hold up exit (e.g. on Ctrl-C)
+        stop_fetching()
         
 
 # __main__ is the entry point for the program when invoked from the command line